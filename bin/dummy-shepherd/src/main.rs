@@ -35,12 +35,48 @@ use std::{
 
 use shepherd_lib::{
     feed::Feed,
+    ids::ItemId,
     shepherd::{ShepherdEvent, SimulationEvent},
     simulation::Epoch,
 };
 
+/// The number of items placed in each feed
+const FEED_SIZE: usize = 10;
+
+/// Choose up to [`FEED_SIZE`] items that a sheep hasn't seen yet
+///
+/// While at least half of the known items are unseen, items are drawn at
+/// random and redrawn if they've already been seen or chosen, which takes
+/// fewer than two draws per item on average. Past that point the unseen
+/// items are enumerated and sampled from directly
+fn choose_unseen(
+    rng: &mut (impl Rng + ?Sized),
+    items: &[ItemId],
+    seen: &HashSet<ItemId>,
+) -> Vec<ItemId> {
+    let n_unseen = items.len() - seen.len();
+    if n_unseen > FEED_SIZE && n_unseen * 2 >= items.len() {
+        let mut chosen = Vec::with_capacity(FEED_SIZE);
+        while chosen.len() < FEED_SIZE {
+            let item = items[rng.gen_range(0..items.len())];
+            if !seen.contains(&item) && !chosen.contains(&item) {
+                chosen.push(item);
+            }
+        }
+
+        chosen
+    } else {
+        items
+            .iter()
+            .filter(|item| !seen.contains(item))
+            .copied()
+            .choose_multiple(rng, FEED_SIZE)
+    }
+}
+
 fn main() -> anyhow::Result<()> {
-    let mut items = HashSet::new();
+    let mut rng = rand::thread_rng();
+    let mut items = Vec::new();
     let mut sheep_seen = HashMap::new();
     let mut stdout = io::stdout();
 
@@ -60,10 +96,7 @@ fn main() -> anyhow::Result<()> {
             SimulationEvent::FeedRequest { sheep } => {
                 let seen =
                     sheep_seen.entry(sheep).or_insert_with(HashSet::new);
-                let chosen = items
-                    .difference(seen)
-                    .copied()
-                    .choose_multiple(&mut rand::thread_rng(), 10);
+                let chosen = choose_unseen(&mut rng, &items, seen);
                 seen.extend(chosen.iter().copied());
                 serde_json::to_writer(
                     &mut stdout,
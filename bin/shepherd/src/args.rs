@@ -9,11 +9,13 @@ pub struct Args<'de> {
     pub n_epochs: usize,
     pub shepherds: Vec<Shepherd<'de>>,
     pub database_file: Option<PathBuf>,
+    pub skip_graph: bool,
+    pub seed: Option<u64>,
 }
 
 fn usage() {
     println!(
-        "usage: {} [-h|--help] [-n|--n-epochs=EPOCHS] [-d|--database=DATABASE_FILE] [shepherds...]",
+        "usage: {} [-h|--help] [-n|--n-epochs=EPOCHS] [-d|--database=DATABASE_FILE] [--no-graph] [-s|--seed=SEED] [shepherds...]",
         env::args().next().as_deref().unwrap_or("shepherd")
     );
 }
@@ -43,6 +45,18 @@ pub fn parse_args<'de>() -> anyhow::Result<Args<'de>> {
                         .into(),
                 );
             }
+            Long("no-graph") => {
+                args.skip_graph = true;
+            }
+            Short('s') | Long("seed") => {
+                args.seed = Some(
+                    parser
+                        .value()
+                        .context("No argument given to -s or --seed")?
+                        .parse()
+                        .context("Invalid argument to -s or --seed")?,
+                );
+            }
             Value(shepherd) => {
                 args.shepherds.push(Shepherd::new(shepherd).context(
                     "Unable to build a shepherd from a given path",
@@ -29,6 +29,7 @@
 use anyhow::Context;
 use duckdb::{params, Connection};
 use petgraph::dot::Dot;
+use rand::{rngs::StdRng, SeedableRng};
 use std::{
     collections::HashMap,
     io,
@@ -53,7 +54,17 @@ fn main() -> anyhow::Result<()> {
         n_epochs,
         shepherds,
         database_file,
+        skip_graph,
+        seed,
     } = args::parse_args().context("Unable to parse arguments")?;
+
+    // a single generator drives every random draw the simulation makes, and
+    // feeds are rated with generators seeded from it on the simulation's
+    // thread, so a given seed reproduces the simulation regardless of how
+    // the shepherds' threads are scheduled (provided the shepherds are
+    // deterministic)
+    let mut rng =
+        seed.map_or_else(StdRng::from_entropy, StdRng::seed_from_u64);
     let mut shepherd_names = HashMap::new();
 
     let duckdb = if let Some(database_file) = database_file {
@@ -90,7 +101,7 @@ fn main() -> anyhow::Result<()> {
         ..
     } = {
         let mut simulation = Simulation::new(
-            &mut rand::thread_rng(),
+            &mut rng,
             shepherds,
             Settings {
                 new_epoch_hook: Some(Box::new(|i, _| {
@@ -134,7 +145,7 @@ fn main() -> anyhow::Result<()> {
 
         for _ in 0..n_epochs {
             simulation
-                .simulate_epoch(&mut rand::thread_rng())
+                .simulate_epoch(&mut rng)
                 .context("Unable to simulate an epoch")?;
         }
 
@@ -143,7 +154,11 @@ fn main() -> anyhow::Result<()> {
             .context("Unable to cleanly stop the simulation")?
     };
 
-    println!("{:?}", Dot::new(&graph));
+    // formatting the graph is expensive for long simulations, so it can be
+    // skipped when only the database is wanted
+    if !skip_graph {
+        println!("{:?}", Dot::new(&graph));
+    }
 
     Ok(())
 }
@@ -1,21 +1,152 @@
 use itertools::Itertools;
 use petgraph::{prelude::*, Graph};
-use rand::{distributions::uniform::SampleRange, prelude::*};
+use rand::{distributions::Uniform, prelude::*};
 use statrs::distribution::{Poisson, PoissonError};
-use std::collections::HashSet;
+use std::{cmp::Reverse, collections::BinaryHeap, ops::RangeInclusive};
 
-use crate::ids::{self, GraphId, NodeType, TagId};
+use crate::{
+    ids::{self, GraphId, IdSet, NodeType, TagId},
+    sheep::PathMeasure,
+};
+
+/// The probability of an edge being formed between two tags belonging to
+/// different groups
+const INTER_GROUP_EDGE_PROBABILITY: f64 = 1e-3;
+
+/// A pair of tags along with the weights of the edges between them in either
+/// direction, as accepted by [`Simulation::add_tag_edges`]
+type TagEdge<'t> = ((&'t TagId, &'t TagId), (u32, u32));
+
+/// The distributions used to sample the edges formed within and across tag
+/// groups
+///
+/// These are constructed once per call rather than once per edge, and the
+/// weights are drawn as a stream which is zipped against the pairs of tags
+/// being connected
+struct TagGroupDistributions {
+    intra_group_weight: Uniform<u32>,
+    inter_group_weight: Uniform<u32>,
+
+    /// The natural logarithm of the probability of an edge not being formed
+    /// between two tags belonging to different groups
+    ln_inter_group_miss: f64,
+}
+
+impl TagGroupDistributions {
+    fn new() -> Self {
+        Self {
+            intra_group_weight: Uniform::new_inclusive(5, 10),
+            inter_group_weight: Uniform::new_inclusive(1, 5),
+            ln_inter_group_miss: (-INTER_GROUP_EDGE_PROBABILITY).ln_1p(),
+        }
+    }
+
+    /// Samples the pairs of tags connected across two different tag groups,
+    /// pushing them onto `pairs`
+    ///
+    /// Each pair of tags is connected with probability
+    /// [`INTER_GROUP_EDGE_PROBABILITY`], but rather than drawing a trial for
+    /// every pair, the number of pairs skipped before the next edge is drawn
+    /// from the geometric distribution. Only the pairs which end up being
+    /// connected are ever visited
+    ///
+    /// The weights of the edges are left to be drawn in one stream once the
+    /// pairs across every group have been sampled
+    fn inter_group_pairs<'t>(
+        &self,
+        rng: &mut (impl Rng + ?Sized),
+        group_a: &'t [TagId],
+        group_b: &'t [TagId],
+        pairs: &mut Vec<(&'t TagId, &'t TagId)>,
+    ) {
+        let n = group_a.len() * group_b.len();
+        let mut i = 0_usize;
+        loop {
+            // `1 - u` lies within `(0, 1]`, so the logarithm is finite
+            let u = rng.gen::<f64>();
+            let skipped = ((1.0 - u).ln() / self.ln_inter_group_miss).floor();
+
+            i = i.saturating_add(skipped as usize);
+            if i >= n {
+                break;
+            }
+
+            pairs.push((
+                &group_a[i / group_b.len()],
+                &group_b[i % group_b.len()],
+            ));
+            i += 1;
+        }
+    }
+}
+
+/// Iterate over every unordered pair of distinct elements in a slice
+///
+/// The pairs are produced by indexing into the upper triangle of the slice's
+/// pairwise matrix, avoiding the iterator cloning and buffering done by
+/// [`Itertools::tuple_combinations`]
+fn pairs<T>(items: &[T]) -> impl Iterator<Item = (&T, &T)> {
+    items
+        .iter()
+        .enumerate()
+        .flat_map(move |(i, a)| items[i + 1..].iter().map(move |b| (a, b)))
+}
+
+/// The number of unordered pairs of distinct elements among `n` elements
+fn n_pairs(n: usize) -> usize {
+    n * n.saturating_sub(1) / 2
+}
+
+/// Splits `tags` into up to `max_groups` consecutive runs, with lengths
+/// drawn from a Poisson distribution with the provided mean, and pushes them
+/// onto `groups`
+///
+/// The tags left over once the runs run out are returned so that they can be
+/// orphaned
+fn split_into_groups<'t>(
+    rng: &mut (impl Rng + ?Sized),
+    tags: &'t [TagId],
+    mean_group_size: f64,
+    max_groups: usize,
+    groups: &mut Vec<Vec<TagId>>,
+) -> Result<&'t [TagId], PoissonError> {
+    let mut n_stored = 0;
+    for mut n_tags in Poisson::new(mean_group_size)?
+        .sample_iter(&mut *rng)
+        .map(|n: u64| n as usize)
+        .take(max_groups)
+    {
+        if n_stored + n_tags >= tags.len() {
+            n_tags = tags.len() - n_stored;
+            if n_tags == 0 {
+                break;
+            }
+        }
+
+        groups.push(tags[n_stored..n_stored + n_tags].to_vec());
+        n_stored += n_tags;
+    }
+
+    Ok(&tags[n_stored..])
+}
 
 /// A container type holding the graph organizing the simulation data
 ///
 /// Wraps a [`Graph`] with methods for working with the graph in the manner
 /// laid out in the tag graph Jupyter notebook, with some extensions to
 /// support gradually building it up across many epochs
+///
+/// The graph is indexed with [`u32`]s rather than [`usize`]s, which keeps its
+/// node and edge arrays compact while still leaving room for billions of
+/// nodes
 #[derive(Default)]
-pub struct Simulation(pub Graph<NodeType, u32, Directed, usize>);
+pub struct Simulation(pub Graph<NodeType, u32, Directed, u32>);
 
 impl Simulation {
     /// Adds several nodes to the simulation
+    ///
+    /// Space for all of the nodes is reserved up front, so the node array is
+    /// grown at most once per call
     #[inline(always)]
     pub fn create_nodes<K>(
         &mut self,
@@ -24,10 +155,68 @@ impl Simulation {
     where
         K: ids::GraphIdKind,
     {
+        self.0.reserve_nodes(n);
         (0..n)
             .map(move |_| GraphId::new(self.0.add_node(K::NODE_TYPE).index()))
     }
 
+    /// Adds edges in both directions between each of the provided pairs of
+    /// tags
+    ///
+    /// The first weight is used for the edge from the first tag to the
+    /// second, and the second weight for the edge in the opposite direction
+    fn add_tag_edges<'t>(
+        &mut self,
+        edges: impl IntoIterator<Item = TagEdge<'t>>,
+    ) {
+        for ((GraphId(a, _), GraphId(b, _)), (weight_ab, weight_ba)) in edges
+        {
+            self.0.add_edge(
+                NodeIndex::new(*a),
+                NodeIndex::new(*b),
+                weight_ab,
+            );
+            self.0.add_edge(
+                NodeIndex::new(*b),
+                NodeIndex::new(*a),
+                weight_ba,
+            );
+        }
+    }
+
+    /// Builds an [`Adjacency`] snapshot of the simulation graph's edges
+    pub fn adjacency(&self) -> Adjacency {
+        let edges = self.0.raw_edges();
+
+        // count the outgoing edges of each node, then turn the counts into
+        // the offsets each node's edges start at
+        let mut offsets = vec![0; self.0.node_count() + 1];
+        for edge in edges {
+            offsets[edge.source().index()] += 1;
+        }
+        let mut n_edges = 0;
+        for offset in &mut offsets {
+            let n_node_edges = *offset;
+            *offset = n_edges;
+            n_edges += n_node_edges;
+        }
+
+        // the graph is indexed with `u32`s, so every target fits in one
+        let mut cursors = offsets.clone();
+        let mut node_edges = vec![(0, PathMeasure::default()); edges.len()];
+        for edge in edges {
+            let cursor = &mut cursors[edge.source().index()];
+            node_edges[*cursor] =
+                (edge.target().index() as u32, PathMeasure::new(edge.weight));
+            *cursor += 1;
+        }
+
+        Adjacency {
+            offsets,
+            edges: node_edges,
+        }
+    }
+
     /// Get the associated tags of either a [`SheepId`] or an [`ItemId`]
     ///
     /// Because of how the simulation graph is assembled, this is able to just
@@ -41,7 +230,7 @@ impl Simulation {
         K: ids::IsItemOrSheep,
     {
         self.0
-            .neighbors_undirected(id.into())
+            .neighbors_undirected(NodeIndex::new(id))
             .map(|id| GraphId::new(id.index()))
     }
 
@@ -49,75 +238,71 @@ impl Simulation {
     ///
     /// This method builds groups of tags (which are all connected to one
     /// another by edges with weights in the range `5..=10`) and forms edges
-    /// across groups (with weights in the range `1..=5`)
+    /// across groups (with weights in the range `1..=5`). Any groups already
+    /// present were connected when they were formed, so only edges within
+    /// the new groups and between a new group and any other are added
     pub fn add_new_tag_groups(
         &mut self,
         rng: &mut (impl Rng + ?Sized),
-        groups: &mut Vec<HashSet<TagId>>,
-        orphans: &mut HashSet<TagId>,
+        groups: &mut Vec<Vec<TagId>>,
+        orphans: &mut IdSet<TagId>,
         max_groups: usize,
         tags: impl IntoIterator<Item = TagId>,
     ) -> Result<(), PoissonError> {
         groups.reserve(max_groups);
+        let n_existing_groups = groups.len();
         let mut tags = tags.into_iter().collect::<Vec<TagId>>();
         tags.shuffle(rng);
 
-        let mut n_stored = 0;
-        for mut n_tags in
-            Poisson::new((tags.len() as f64) / ((max_groups + 5) as f64))?
-                .sample_iter(&mut *rng)
-                .map(|n: u64| n as usize)
-                .take(max_groups)
-        {
-            if n_stored + n_tags >= tags.len() {
-                n_tags = tags.len() - n_stored;
-                if n_tags == 0 {
-                    break;
-                }
-            }
+        orphans.extend(split_into_groups(
+            &mut *rng,
+            &tags,
+            (tags.len() as f64) / ((max_groups + 5) as f64),
+            max_groups,
+            groups,
+        )?);
 
-            groups.push(
-                tags[n_stored..n_stored + n_tags].iter().copied().collect(),
-            );
-            n_stored += n_tags;
-        }
-        orphans.extend(tags[n_stored..].iter().copied());
+        let distributions = TagGroupDistributions::new();
 
-        for group in &*groups {
-            for (GraphId(a, _), GraphId(b, _)) in
-                group.iter().tuple_combinations()
-            {
-                self.0.add_edge(
-                    (*a).into(),
-                    (*b).into(),
-                    rng.gen_range(5..=10),
-                );
-                self.0.add_edge(
-                    (*b).into(),
-                    (*a).into(),
-                    rng.gen_range(5..=10),
-                );
-            }
-        }
+        // the edges within every group are added in a single pass, drawing
+        // their weights from one stream and reserving space for all of them
+        // up front
+        let new_groups = &groups[n_existing_groups..];
+        self.0.reserve_edges(
+            new_groups
+                .iter()
+                .map(|group| n_pairs(group.len()) * 2)
+                .sum(),
+        );
+        self.add_tag_edges(
+            new_groups.iter().flat_map(|group| pairs(group)).zip(
+                distributions
+                    .intra_group_weight
+                    .sample_iter(&mut *rng)
+                    .tuples(),
+            ),
+        );
 
-        for (group_a, group_b) in groups.iter().tuple_combinations() {
-            for (GraphId(a, _), GraphId(b, _)) in
-                group_a.iter().cartesian_product(group_b)
-            {
-                if rng.gen::<f64>() <= 1e-3 {
-                    self.0.add_edge(
-                        (*a).into(),
-                        (*b).into(),
-                        rng.gen_range(1..=5),
-                    );
-                    self.0.add_edge(
-                        (*b).into(),
-                        (*a).into(),
-                        rng.gen_range(1..=5),
-                    );
-                }
-            }
+        let mut connected = Vec::new();
+        for (i, j) in (n_existing_groups..groups.len())
+            .flat_map(|j| (0..j).map(move |i| (i, j)))
+        {
+            distributions.inter_group_pairs(
+                &mut *rng,
+                &groups[i],
+                &groups[j],
+                &mut connected,
+            );
         }
+        self.0.reserve_edges(connected.len() * 2);
+        self.add_tag_edges(
+            connected.into_iter().zip(
+                distributions
+                    .inter_group_weight
+                    .sample_iter(&mut *rng)
+                    .tuples(),
+            ),
+        );
 
         Ok(())
     }
@@ -130,11 +315,11 @@ impl Simulation {
     pub fn add_to_tag_groups(
         &mut self,
         rng: &mut (impl Rng + ?Sized),
-        groups: &mut [HashSet<TagId>],
-        orphans: &mut HashSet<TagId>,
+        groups: &mut [Vec<TagId>],
+        orphans: &mut IdSet<TagId>,
         tags: impl IntoIterator<Item = TagId>,
     ) -> Result<(), PoissonError> {
-        let mut new_members: Vec<HashSet<TagId>> =
+        let mut new_members: Vec<Vec<TagId>> =
             Vec::with_capacity(groups.len());
         let mut tags = tags.into_iter().collect::<Vec<TagId>>();
         tags.shuffle(rng);
@@ -143,77 +328,61 @@ impl Simulation {
             return Ok(());
         }
 
-        let mut n_stored = 0;
-        for mut n_tags in
-            Poisson::new((tags.len() as f64) / ((groups.len() + 50) as f64))?
-                .sample_iter(&mut *rng)
-                .map(|n: u64| n as usize)
-                .take(groups.len())
-        {
-            if n_stored + n_tags >= tags.len() {
-                n_tags = tags.len() - n_stored;
-                if n_tags == 0 {
-                    break;
-                }
-            }
+        orphans.extend(split_into_groups(
+            &mut *rng,
+            &tags,
+            (tags.len() as f64) / ((groups.len() + 50) as f64),
+            groups.len(),
+            &mut new_members,
+        )?);
 
-            new_members.push(
-                tags[n_stored..n_stored + n_tags].iter().copied().collect(),
-            );
-            n_stored += n_tags;
-        }
-        orphans.extend(tags[n_stored..].iter().copied());
-
-        for (i, members) in new_members.iter().enumerate() {
-            for (GraphId(a, _), GraphId(b, _)) in
-                members.iter().tuple_combinations()
-            {
-                self.0.add_edge(
-                    (*a).into(),
-                    (*b).into(),
-                    rng.gen_range(5..=10),
-                );
-                self.0.add_edge(
-                    (*b).into(),
-                    (*a).into(),
-                    rng.gen_range(5..=10),
-                );
-            }
+        let distributions = TagGroupDistributions::new();
 
-            for (GraphId(a, _), GraphId(b, _)) in
-                members.iter().cartesian_product(groups[i].iter())
-            {
-                self.0.add_edge(
-                    (*a).into(),
-                    (*b).into(),
-                    rng.gen_range(5..=10),
-                );
-                self.0.add_edge(
-                    (*b).into(),
-                    (*a).into(),
-                    rng.gen_range(5..=10),
-                );
-            }
-        }
+        // as in `add_new_tag_groups`, the edges within every group are added
+        // in a single pass
+        self.0.reserve_edges(
+            new_members
+                .iter()
+                .zip(groups.iter())
+                .map(|(members, group)| {
+                    (n_pairs(members.len()) + members.len() * group.len()) * 2
+                })
+                .sum(),
+        );
+        self.add_tag_edges(
+            new_members
+                .iter()
+                .zip(groups.iter())
+                .flat_map(|(members, group)| {
+                    pairs(members)
+                        .chain(members.iter().cartesian_product(group.iter()))
+                })
+                .zip(
+                    distributions
+                        .intra_group_weight
+                        .sample_iter(&mut *rng)
+                        .tuples(),
+                ),
+        );
 
+        let mut connected = Vec::new();
         for (i, j) in (0..new_members.len()).tuple_combinations() {
-            for (GraphId(a, _), GraphId(b, _)) in
-                new_members[i].iter().cartesian_product(groups[j].iter())
-            {
-                if rng.gen::<f64>() <= 1e-3 {
-                    self.0.add_edge(
-                        (*a).into(),
-                        (*b).into(),
-                        rng.gen_range(1..=5),
-                    );
-                    self.0.add_edge(
-                        (*b).into(),
-                        (*a).into(),
-                        rng.gen_range(1..=5),
-                    );
-                }
-            }
+            distributions.inter_group_pairs(
+                &mut *rng,
+                &new_members[i],
+                &groups[j],
+                &mut connected,
+            );
         }
+        self.0.reserve_edges(connected.len() * 2);
+        self.add_tag_edges(
+            connected.into_iter().zip(
+                distributions
+                    .inter_group_weight
+                    .sample_iter(&mut *rng)
+                    .tuples(),
+            ),
+        );
 
         for (group, new_members) in groups.iter_mut().zip(new_members) {
             group.extend(new_members);
@@ -228,16 +397,23 @@ impl Simulation {
     /// A number of edges within the range specified by `edge_bounds` will be
     /// added from a source node to distinct target nodes. A weight in the
     /// range `1..=10` is assigned to the edge, sampled from a discrete
-    /// uniform distribution
-    pub fn connect_extremities<K>(
+    /// uniform distribution. The tags each source node is connected to are
+    /// recorded in the list paired with it
+    ///
+    /// Targets are chosen by partially shuffling `target_nodes` in place,
+    /// which avoids copying every target or allocating a set of sampled
+    /// indices per source, so the order of `target_nodes` is not preserved
+    pub fn connect_extremities<'s, K>(
         &mut self,
         rng: &mut (impl Rng + ?Sized),
-        source_nodes: impl IntoIterator<Item = (&GraphId<K>, &mut Vec<usize>)>,
-        target_nodes: impl IntoIterator<Item = TagId> + Clone,
-        edge_bounds: impl SampleRange<usize> + Clone,
+        source_nodes: impl IntoIterator<
+            Item = (&'s GraphId<K>, &'s mut Vec<TagId>),
+        >,
+        target_nodes: &mut [TagId],
+        edge_bounds: RangeInclusive<usize>,
         reverse_direction: bool,
     ) where
-        K: ids::IsItemOrSheep,
+        K: ids::IsItemOrSheep + 's,
     {
         // TODO: add some behavior here where we "magically" connect new tags
         //       to source nodes. the chance of this happening will be
@@ -246,27 +422,347 @@ impl Simulation {
         //       associated with the edge between the candidate tag and the
         //       tag already connected to the source node
 
-        for GraphId(source, _) in source_nodes {
-            let n_edges = rng.gen_range(edge_bounds.clone());
-            for GraphId(tag, _) in target_nodes
-                .clone()
-                .into_iter()
-                .choose_multiple(rng, n_edges)
+        let n_edges_distribution = Uniform::from(edge_bounds);
+        let weight_distribution = Uniform::new_inclusive(1, 10);
+
+        let n_targets = target_nodes.len();
+        let mut edges = Vec::new();
+        for (GraphId(source, _), tags) in source_nodes {
+            let n_edges = n_edges_distribution.sample(rng);
+
+            // when every target is taken, there's no need to shuffle them
+            let chosen = if n_edges >= n_targets {
+                &*target_nodes
+            } else {
+                &*target_nodes.partial_shuffle(rng, n_edges).0
+            };
+            let n_edges = chosen.len();
+
+            tags.reserve(n_edges);
+            edges.reserve(n_edges);
+            for (&tag, weight) in chosen
+                .iter()
+                .zip(weight_distribution.sample_iter(&mut *rng))
             {
-                if reverse_direction {
-                    self.0.add_edge(
-                        tag.into(),
-                        source.into(),
-                        rng.gen_range(1..=10),
-                    );
+                tags.push(tag);
+                edges.push(if reverse_direction {
+                    (tag.0, *source, weight)
                 } else {
-                    self.0.add_edge(
-                        source.into(),
-                        tag.into(),
-                        rng.gen_range(1..=10),
-                    );
+                    (*source, tag.0, weight)
+                });
+            }
+        }
+
+        self.0.reserve_edges(edges.len());
+        for (a, b, weight) in edges {
+            self.0
+                .add_edge(NodeIndex::new(a), NodeIndex::new(b), weight);
+        }
+    }
+}
+
+/// A compressed sparse row snapshot of the edges in a [`Simulation`]
+///
+/// This is meant to be built once the graph has stopped changing for an
+/// epoch, so that shortest path queries walk contiguous arrays rather than
+/// the linked edge lists maintained by [`Graph`]
+pub struct Adjacency {
+    /// The offset into `edges` at which each node's outgoing edges begin,
+    /// followed by the total number of edges
+    offsets: Vec<usize>,
+
+    /// The target of each edge and the cost of traversing it
+    ///
+    /// The costs are precomputed from the edges' weights so that shortest
+    /// path queries only need to add costs together, and are stored
+    /// alongside the [`u32`] targets so that a node's edges are read from a
+    /// single contiguous run of memory
+    edges: Vec<(u32, PathMeasure)>,
+}
+
+impl Adjacency {
+    /// Get the outgoing edges of a node as pairs of targets and costs
+    pub fn edges(
+        &self,
+        node: usize,
+    ) -> impl Iterator<Item = (usize, PathMeasure)> + '_ {
+        self.edges[self.offsets[node]..self.offsets[node + 1]]
+            .iter()
+            .map(|&(target, cost)| (target as usize, cost))
+    }
+
+    /// Creates a [`PathFinder`] for running shortest path queries against
+    /// this snapshot
+    pub fn path_finder(&self) -> PathFinder<'_> {
+        let n_nodes = self.offsets.len() - 1;
+        PathFinder {
+            graph: self,
+            scores: vec![None; n_nodes],
+            settled: vec![false; n_nodes],
+            touched: Vec::new(),
+            frontier: BinaryHeap::new(),
+        }
+    }
+}
+
+/// Reusable state for running shortest path queries against an
+/// [`Adjacency`]
+///
+/// Scores are kept in arrays indexed by node rather than in hash maps, and
+/// only the entries touched by a query are reset before the next one, so a
+/// single [`PathFinder`] can serve many queries without reallocating
+pub struct PathFinder<'a> {
+    /// The snapshot being queried
+    graph: &'a Adjacency,
+
+    /// The best known measure of a path to each node
+    scores: Vec<Option<PathMeasure>>,
+
+    /// Whether the shortest path to each node has been found
+    settled: Vec<bool>,
+
+    /// The nodes whose entries in `scores` and `settled` have been written
+    touched: Vec<usize>,
+
+    /// The nodes yet to be settled, ordered by the measure of their paths
+    frontier: BinaryHeap<Reverse<(PathMeasure, usize)>>,
+}
+
+impl PathFinder<'_> {
+    /// Find the measures of the shortest paths from `source` to each of
+    /// `targets`, if they exist
+    ///
+    /// This is a single run of Dijkstra's algorithm from `source`, stopping
+    /// as soon as every target has been reached. The measures are returned
+    /// in the same order as `targets`
+    ///
+    /// Targets come from feeds built by shepherds, so any target which isn't
+    /// a node in the graph is treated as unreachable rather than trusted
+    pub fn shortest_paths(
+        &mut self,
+        source: usize,
+        targets: &[usize],
+    ) -> Vec<Option<PathMeasure>> {
+        let graph = self.graph;
+
+        for node in self.touched.drain(..) {
+            self.scores[node] = None;
+            self.settled[node] = false;
+        }
+        self.frontier.clear();
+
+        let n_nodes = self.settled.len();
+        let mut pending = targets
+            .iter()
+            .copied()
+            .filter(|&target| target < n_nodes)
+            .collect::<IdSet<_>>();
+
+        self.scores[source] = Some(PathMeasure::default());
+        self.touched.push(source);
+        self.frontier
+            .push(Reverse((PathMeasure::default(), source)));
+
+        while let Some(Reverse((score, node))) = self.frontier.pop() {
+            if pending.is_empty() {
+                break;
+            }
+
+            if self.settled[node] {
+                continue;
+            }
+            self.settled[node] = true;
+
+            if pending.remove(&node) && pending.is_empty() {
+                break;
+            }
+
+            for (next, cost) in graph.edges(node) {
+                if self.settled[next] {
+                    continue;
                 }
+
+                let next_score = score + cost;
+                if let Some(previous_score) = self.scores[next] {
+                    if previous_score <= next_score {
+                        continue;
+                    }
+                } else {
+                    self.touched.push(next);
+                }
+
+                self.scores[next] = Some(next_score);
+                self.frontier.push(Reverse((next_score, next)));
             }
         }
+
+        // only the scores of settled nodes are final, and any target left
+        // unsettled once the frontier is exhausted is unreachable
+        targets
+            .iter()
+            .map(|&target| {
+                if self.settled.get(target).copied().unwrap_or(false) {
+                    self.scores[target]
+                } else {
+                    None
+                }
+            })
+            .collect()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use petgraph::algo;
+    use rand::rngs::StdRng;
+
+    use super::*;
+
+    /// Build a small graph with a cycle, a parallel edge, a pair of nodes
+    /// unreachable from the rest, and an isolated node
+    fn fixed_graph() -> Simulation {
+        let mut graph = Simulation::default();
+        for _ in 0..8 {
+            graph.0.add_node(NodeType::Tag);
+        }
+        for (a, b, weight) in [
+            (0, 1, 4),
+            (0, 2, 1),
+            (2, 1, 2),
+            (2, 1, 7),
+            (1, 3, 1),
+            (2, 3, 5),
+            (3, 4, 3),
+            (4, 0, 1),
+            (5, 6, 2),
+        ] {
+            graph
+                .0
+                .add_edge(NodeIndex::new(a), NodeIndex::new(b), weight);
+        }
+
+        graph
+    }
+
+    /// Find the measure of the shortest path from `source` to every node
+    /// with petgraph's implementation of Dijkstra's algorithm
+    fn dijkstra(
+        graph: &Simulation,
+        source: usize,
+    ) -> Vec<Option<PathMeasure>> {
+        let scores =
+            algo::dijkstra(&graph.0, NodeIndex::new(source), None, |edge| {
+                PathMeasure::new(*edge.weight())
+            });
+
+        (0..graph.0.node_count())
+            .map(|node| scores.get(&NodeIndex::new(node)).copied())
+            .collect()
+    }
+
+    #[test]
+    fn adjacency_matches_graph_edges() {
+        let graph = fixed_graph();
+        let adjacency = graph.adjacency();
+
+        for node in 0..graph.0.node_count() {
+            let mut expected = graph
+                .0
+                .edges(NodeIndex::new(node))
+                .map(|edge| {
+                    (edge.target().index(), PathMeasure::new(*edge.weight()))
+                })
+                .collect::<Vec<_>>();
+            let mut edges = adjacency.edges(node).collect::<Vec<_>>();
+            expected.sort_unstable();
+            edges.sort_unstable();
+
+            assert_eq!(edges, expected, "edges of node {node}");
+        }
+    }
+
+    #[test]
+    fn shortest_paths_match_dijkstra() {
+        let graph = fixed_graph();
+        let adjacency = graph.adjacency();
+        let mut paths = adjacency.path_finder();
+        let targets = (0..graph.0.node_count()).collect::<Vec<_>>();
+
+        // the same path finder is reused across sources, as it is when
+        // processing feeds
+        for source in 0..graph.0.node_count() {
+            assert_eq!(
+                paths.shortest_paths(source, &targets),
+                dijkstra(&graph, source),
+                "paths from node {source}",
+            );
+        }
+    }
+
+    #[test]
+    fn shortest_paths_ignore_unknown_targets() {
+        let graph = fixed_graph();
+        let adjacency = graph.adjacency();
+        let mut paths = adjacency.path_finder();
+        let n_nodes = graph.0.node_count();
+        let expected = dijkstra(&graph, 0);
+
+        assert_eq!(
+            paths.shortest_paths(0, &[3, n_nodes, 5, usize::MAX, 1]),
+            vec![expected[3], None, None, None, expected[1]],
+        );
+        assert_eq!(paths.shortest_paths(0, &[n_nodes]), vec![None]);
+    }
+
+    #[test]
+    fn inter_group_pairs_are_distinct_and_in_range() {
+        let mut rng = StdRng::seed_from_u64(0x5eed);
+        let distributions = TagGroupDistributions::new();
+        let group_a = (0..200).map(GraphId::new).collect::<Vec<TagId>>();
+        let group_b = (200..500).map(GraphId::new).collect::<Vec<TagId>>();
+
+        let n_runs = 50;
+        let mut n_connected = 0;
+        for _ in 0..n_runs {
+            let mut pairs = Vec::new();
+            distributions
+                .inter_group_pairs(&mut rng, &group_a, &group_b, &mut pairs);
+
+            let mut seen = IdSet::default();
+            for (a, b) in &pairs {
+                assert!(
+                    group_a.contains(a),
+                    "{a:?} isn't in the first group"
+                );
+                assert!(
+                    group_b.contains(b),
+                    "{b:?} isn't in the second group"
+                );
+                assert!(seen.insert((a.0, b.0)), "{a:?} and {b:?} repeated");
+            }
+            n_connected += pairs.len();
+        }
+
+        // three million trials are expected to give three thousand edges,
+        // with a standard deviation of about 55
+        let n_trials = (n_runs * group_a.len() * group_b.len()) as f64;
+        let rate = n_connected as f64 / n_trials;
+        assert!(
+            (rate - INTER_GROUP_EDGE_PROBABILITY).abs()
+                < INTER_GROUP_EDGE_PROBABILITY * 0.1,
+            "edge rate {rate} is far from {INTER_GROUP_EDGE_PROBABILITY}",
+        );
+    }
+
+    #[test]
+    fn inter_group_pairs_of_an_empty_group() {
+        let mut rng = StdRng::seed_from_u64(0x5eed);
+        let distributions = TagGroupDistributions::new();
+        let group = (0..10).map(GraphId::new).collect::<Vec<TagId>>();
+
+        let mut pairs = Vec::new();
+        distributions.inter_group_pairs(&mut rng, &group, &[], &mut pairs);
+        distributions.inter_group_pairs(&mut rng, &[], &group, &mut pairs);
+        assert!(pairs.is_empty());
     }
 }
@@ -1,5 +1,56 @@
 use serde::{Deserialize, Serialize};
-use std::marker::PhantomData;
+use std::{
+    collections::{HashMap, HashSet},
+    hash::{BuildHasherDefault, Hasher},
+    marker::PhantomData,
+};
+
+/// A [`HashMap`] keyed by identifiers within the simulation
+pub type IdMap<K, V> = HashMap<K, V, BuildHasherDefault<IdHasher>>;
+
+/// A [`HashSet`] of identifiers within the simulation
+pub type IdSet<K> = HashSet<K, BuildHasherDefault<IdHasher>>;
+
+/// The multiplier used by [`IdHasher`] to spread identifiers across the hash
+/// space (`2^64` divided by the golden ratio)
+const ID_HASH_MULTIPLIER: u64 = 0x9e37_79b9_7f4a_7c15;
+
+/// A [`Hasher`] for the identifiers used within the simulation
+///
+/// Every identifier is a plain index, so instead of running each one through
+/// `SipHash` it is mixed into the state with a rotation and a single
+/// multiplication, which is enough to spread sequential indices across the
+/// buckets of a hash table
+#[derive(Copy, Clone, Default, Debug)]
+pub struct IdHasher(u64);
+
+impl IdHasher {
+    /// Mix a value into the hasher's state
+    #[inline(always)]
+    fn mix(&mut self, value: u64) {
+        self.0 =
+            (self.0.rotate_left(5) ^ value).wrapping_mul(ID_HASH_MULTIPLIER);
+    }
+}
+
+impl Hasher for IdHasher {
+    #[inline(always)]
+    fn finish(&self) -> u64 {
+        self.0
+    }
+
+    #[inline]
+    fn write(&mut self, bytes: &[u8]) {
+        for byte in bytes {
+            self.mix(u64::from(*byte));
+        }
+    }
+
+    #[inline(always)]
+    fn write_usize(&mut self, n: usize) {
+        self.mix(n as u64);
+    }
+}
 
 /// An identifier for an epoch within the simulation
 #[repr(transparent)]
@@ -1,24 +1,38 @@
-use petgraph::algo;
-use rand::prelude::*;
-use std::ops::Add;
+use rand::{prelude::*, rngs::StdRng};
+use std::{num::NonZeroUsize, ops::Add, thread};
 use tracing::info;
 
 use crate::{
     feed::{Feed, Response, Responses},
-    graph::Simulation,
+    graph::{Adjacency, PathFinder},
     ids::SheepId,
 };
 
+/// The natural logarithm of `3 / 4`, the base of [`p_positive`]
+const LN_POSITIVE_BASE: f64 = -0.2876820724517809;
+
+/// The natural logarithm of `19 / 20`, the base of [`p_neutral`]
+const LN_NEUTRAL_BASE: f64 = -0.05129329438755058;
+
 /// Calculate the probability of a positive rating given the input sum of
 /// weights along the shortest path
+///
+/// This is `3^distance / 4^distance`, folded into a single power so that it
+/// doesn't overflow into `NaN` for long paths. The logarithm of the base is
+/// precomputed, leaving a single call to [`f64::exp`]
+#[inline]
 pub fn p_positive(distance: f64) -> f64 {
-    3f64.powf(distance) / 4f64.powf(distance)
+    (distance * LN_POSITIVE_BASE).exp()
 }
 
 /// Calculate the probability of a neutral rating given the input sum of
 /// weights along the shortest path
+///
+/// This is `19^distance / 20^distance`, folded in the same manner as
+/// [`p_positive`]
+#[inline]
 pub fn p_neutral(distance: f64) -> f64 {
-    19f64.powf(distance) / 20f64.powf(distance)
+    (distance * LN_NEUTRAL_BASE).exp()
 }
 
 /// Wrapper around a pair to count both the number of vertices visited and
@@ -46,81 +60,199 @@ impl Add for PathMeasure {
     }
 }
 
-/// Process a feed given the tag graph, sheep id, and feed
+/// Process a feed given a [`PathFinder`] over a snapshot of the tag graph,
+/// sheep id, and feed
+///
+/// The paths to every item in the feed are found with a single search from
+/// the sheep
 pub fn process_feed(
     rng: &mut (impl Rng + ?Sized),
-    graph: &Simulation,
+    paths: &mut PathFinder,
     sheep: SheepId,
-    feed: Feed,
+    feed: &Feed,
 ) -> Responses {
     let mut responses = Vec::with_capacity(feed.0.len());
+    let measures = paths.shortest_paths(
+        sheep.0,
+        &feed.0.iter().map(|item| item.0).collect::<Vec<_>>(),
+    );
 
-    for item in feed.0 {
-        responses.push(
-            if let Some(PathMeasure(distance, hops)) = algo::dijkstra(
-                &graph.0,
-                sheep.0.into(),
-                Some(item.0.into()),
-                |e| PathMeasure::new(*e.weight()),
-            )
-            .get(&item.0.into())
-            {
-                (
-                    item,
-                    match rng.gen::<f64>() {
-                        c if c <= p_positive(f64::from(*distance)) => {
-                            info!(
-                                sheep = sheep.0,
-                                item = item.0,
-                                distance = distance,
-                                probability = c,
-                                threshold = p_positive(f64::from(*distance)),
-                                rating = "positive"
-                            );
-                            Response::Positive
-                        }
-                        c if c <= p_neutral(f64::from(*distance)) => {
-                            info!(
-                                sheep = sheep.0,
-                                item = item.0,
-                                distance = distance,
-                                probability = c,
-                                threshold = p_neutral(f64::from(*distance)),
-                                rating = "neutral"
-                            );
-                            Response::Neutral
-                        }
-                        _ => {
-                            info!(
-                                sheep = sheep.0,
-                                item = item.0,
-                                distance = distance,
-                                rating = "negative"
-                            );
-
-                            Response::Negative
-                        }
-                    },
-                    Some(*hops),
-                )
-            } else {
-                // to keep the model simple, we always respond negatively to
-                // content for which no path exists
-                //
-                // the assumptions being made here for this to work are:
-                // - the tag graph is taken to be axiomatic
-                // - everything is comprehensively tagged and no more existing
-                //   tags fit
+    for (item, measure) in feed.0.iter().copied().zip(measures) {
+        responses.push(if let Some(PathMeasure(distance, hops)) = measure {
+            let distance_f64 = f64::from(distance);
+            let c = rng.gen::<f64>();
+
+            // the thresholds are computed only as they are needed so that
+            // they can be both compared against and logged, and the
+            // neutral one is skipped entirely for positive ratings
+            let positive_threshold = p_positive(distance_f64);
+            let response = if c <= positive_threshold {
                 info!(
                     sheep = sheep.0,
                     item = item.0,
-                    distance = "unconnected",
-                    rating = "negative"
+                    distance = distance,
+                    probability = c,
+                    threshold = positive_threshold,
+                    rating = "positive"
                 );
-                (item, Response::Negative, None)
-            },
-        );
+                Response::Positive
+            } else {
+                let neutral_threshold = p_neutral(distance_f64);
+                if c <= neutral_threshold {
+                    info!(
+                        sheep = sheep.0,
+                        item = item.0,
+                        distance = distance,
+                        probability = c,
+                        threshold = neutral_threshold,
+                        rating = "neutral"
+                    );
+                    Response::Neutral
+                } else {
+                    info!(
+                        sheep = sheep.0,
+                        item = item.0,
+                        distance = distance,
+                        rating = "negative"
+                    );
+
+                    Response::Negative
+                }
+            };
+
+            (item, response, Some(hops))
+        } else {
+            // to keep the model simple, we always respond negatively to
+            // content for which no path exists
+            //
+            // the assumptions being made here for this to work are:
+            // - the tag graph is taken to be axiomatic
+            // - everything is comprehensively tagged and no more existing
+            //   tags fit
+            info!(
+                sheep = sheep.0,
+                item = item.0,
+                distance = "unconnected",
+                rating = "negative"
+            );
+            (item, Response::Negative, None)
+        });
     }
 
     Responses(responses)
 }
+
+/// Process the feeds given to many sheep, splitting them across up to
+/// `n_threads` threads
+///
+/// Every sheep's feed is processed independently against the same snapshot
+/// of the tag graph, so each thread is handed a contiguous chunk of the feeds
+/// along with its own [`PathFinder`]. Each feed is rated with its own random
+/// number generator, seeded from `rng` on the calling thread before the work
+/// is split up, so the responses don't depend on the number of threads. The
+/// responses are returned in the same order as the feeds
+pub fn process_feeds(
+    rng: &mut (impl Rng + ?Sized),
+    graph: &Adjacency,
+    feeds: &[(SheepId, Feed)],
+    n_threads: NonZeroUsize,
+) -> Vec<(SheepId, Responses)> {
+    let feeds = feeds
+        .iter()
+        .map(|(sheep, feed)| (rng.gen::<u64>(), *sheep, feed))
+        .collect::<Vec<_>>();
+    let process = |paths: &mut PathFinder, &(seed, sheep, feed)| {
+        let mut rng = StdRng::seed_from_u64(seed);
+        (sheep, process_feed(&mut rng, paths, sheep, feed))
+    };
+
+    if n_threads.get() == 1 || feeds.len() <= 1 {
+        let mut paths = graph.path_finder();
+        return feeds.iter().map(|feed| process(&mut paths, feed)).collect();
+    }
+
+    thread::scope(|scope| {
+        feeds
+            .chunks(feeds.len().div_ceil(n_threads.get()))
+            .map(|feeds| {
+                scope.spawn(move || {
+                    let mut paths = graph.path_finder();
+                    feeds
+                        .iter()
+                        .map(|feed| process(&mut paths, feed))
+                        .collect::<Vec<_>>()
+                })
+            })
+            .collect::<Vec<_>>()
+            .into_iter()
+            .flat_map(|handle| {
+                handle.join().expect("A feed processing thread panicked")
+            })
+            .collect()
+    })
+}
+
+#[cfg(test)]
+mod tests {
+    use petgraph::graph::NodeIndex;
+
+    use super::*;
+    use crate::{
+        graph::Simulation,
+        ids::{GraphId, NodeType},
+    };
+
+    #[test]
+    fn process_feeds_is_independent_of_thread_count() {
+        let mut rng = StdRng::seed_from_u64(0x5eed);
+        let mut graph = Simulation::default();
+        for _ in 0..60 {
+            graph.0.add_node(NodeType::Tag);
+        }
+        for _ in 0..240 {
+            graph.0.add_edge(
+                NodeIndex::new(rng.gen_range(0..60)),
+                NodeIndex::new(rng.gen_range(0..60)),
+                rng.gen_range(1..=10),
+            );
+        }
+        let adjacency = graph.adjacency();
+
+        // some sheep are given items outside of the graph, which are rated
+        // negatively rather than searched for
+        let feeds = (0..20)
+            .map(|sheep| {
+                (
+                    GraphId::new(sheep),
+                    Feed(
+                        (sheep + 30..sheep + 45).map(GraphId::new).collect(),
+                    ),
+                )
+            })
+            .collect::<Vec<_>>();
+        let responses = |n_threads| {
+            process_feeds(
+                &mut StdRng::seed_from_u64(0xfeed),
+                &adjacency,
+                &feeds,
+                NonZeroUsize::new(n_threads)
+                    .expect("The number of threads is zero"),
+            )
+        };
+
+        let expected = responses(1);
+        assert_eq!(expected.len(), feeds.len());
+        for (&(sheep, _), (responding_sheep, _)) in
+            feeds.iter().zip(&expected)
+        {
+            assert_eq!(sheep, *responding_sheep);
+        }
+        for n_threads in [2, 8] {
+            assert_eq!(
+                responses(n_threads),
+                expected,
+                "responses with {n_threads} threads",
+            );
+        }
+    }
+}
@@ -2,6 +2,7 @@ use anyhow::{anyhow, Context};
 use serde::{Deserialize, Serialize};
 use std::{
     ffi::OsStr,
+    io::Write,
     path::Path,
     process::{Child, ChildStdin, ChildStdout, Command, Stdio},
 };
@@ -75,6 +76,15 @@ impl Shepherd<'_> {
             .expect("Unable to pass an event to the shepherd process")
     }
 
+    /// Write one or more [`SimulationEvent`]s which have already been
+    /// serialized with [`SimulationEvent::to_json`] to this [`Shepherd`]'s
+    /// standard input
+    pub fn write_serialized_event(&mut self, event: &[u8]) {
+        (&self.stdin)
+            .write_all(event)
+            .expect("Unable to pass an event to the shepherd process")
+    }
+
     /// Read the next [`ShepherdEvent`] from this [`Shepherd`]'s
     /// standard output
     pub fn read_event(&mut self) -> ShepherdEvent {
@@ -159,6 +169,14 @@ pub enum SimulationEvent {
     },
 }
 
+impl SimulationEvent {
+    /// Serialize this [`SimulationEvent`] to JSON ahead of time, so that it
+    /// can be written to many [`Shepherd`]s without serializing it for each
+    pub fn to_json(&self) -> Vec<u8> {
+        serde_json::to_vec(self).expect("Unable to serialize an event")
+    }
+}
+
 #[non_exhaustive]
 #[derive(Clone, Eq, PartialEq, Debug, Serialize, Deserialize)]
 #[serde(tag = "kind", content = "data")]
@@ -1,13 +1,13 @@
-use rand::prelude::*;
+use rand::{prelude::*, rngs::StdRng};
 use serde::{Deserialize, Serialize};
 use statrs::distribution::PoissonError;
-use std::collections::{HashMap, HashSet};
+use std::{collections::HashMap, mem, num::NonZeroUsize, thread};
 use tracing::info;
 
 use crate::{
     feed::{Feed, Responses},
     graph::Simulation as SimulationGraph,
-    ids::{EpochId, GraphId, ItemId, SheepId, ShepherdId, TagId},
+    ids::{EpochId, IdMap, IdSet, ItemId, SheepId, ShepherdId, TagId},
     sheep,
     shepherd::{Shepherd, SimulationEvent},
 };
@@ -42,8 +42,9 @@ pub struct Settings<'a> {
     ///
     /// Additionally, this is used when adding the first tags. This should be
     /// at most the lower bound of `initial_n_tags_bounds`, but ideally much
-    /// lower than that
-    pub average_tags_per_group: usize,
+    /// lower than that. It is never zero, as the number of groups is found
+    /// by dividing by it
+    pub average_tags_per_group: NonZeroUsize,
 
     /// The threshold of orphaned tags at which new groups will be formed
     ///
@@ -82,7 +83,8 @@ impl Default for Settings<'_> {
             initial_n_tags_bounds: (25, 50),
             initial_n_items_bounds: (40, 60),
             initial_n_sheep_bounds: (50, 100),
-            average_tags_per_group: 4,
+            average_tags_per_group: NonZeroUsize::new(4)
+                .expect("The default average tags per group is zero"),
             orphaned_tag_threshold: 100,
             new_epoch_hook: None,
             feed_generation_hook: None,
@@ -118,21 +120,28 @@ pub struct Simulation<'a, 'de> {
     /// Tags present in the simulation
     tags: Vec<TagId>,
 
-    /// Sheep present in the simulation
-    sheep: HashMap<SheepId, Vec<usize>>,
+    /// The same tags as `tags`, in no particular order
+    ///
+    /// This is partially shuffled in place whenever tags are chosen for new
+    /// sheep or items, which spares copying every tag for each choice while
+    /// leaving `tags` in the order the tags were added
+    tag_pool: Vec<TagId>,
+
+    /// Sheep present in the simulation and the tags associated with each
+    sheep: IdMap<SheepId, Vec<TagId>>,
 
-    /// Items present in the simulation
-    items: HashMap<ItemId, Vec<usize>>,
+    /// Items present in the simulation and the tags associated with each
+    items: IdMap<ItemId, Vec<TagId>>,
 
     /// Tag groups present in the simulation
-    tag_groups: Vec<HashSet<TagId>>,
+    tag_groups: Vec<Vec<TagId>>,
 
     /// Orphaned tags present in the simulation
-    tag_orphans: HashSet<TagId>,
+    tag_orphans: IdSet<TagId>,
 
     /// [`Shepherd`]s present within the simulation and a map keeping track of
     /// the items each one has shown each sheep
-    shepherds: Vec<(Shepherd<'de>, HashMap<SheepId, HashSet<ItemId>>)>,
+    shepherds: Vec<(Shepherd<'de>, IdMap<SheepId, IdSet<ItemId>>)>,
 }
 
 /// A container for the deconstructed parts of a simulation
@@ -149,17 +158,19 @@ pub struct SimulationParts<'a> {
     /// The tags present in the simulation
     pub tags: Vec<TagId>,
 
-    /// The sheep present in the simulation
-    pub sheep: HashMap<SheepId, Vec<usize>>,
+    /// The sheep present in the simulation and the tags associated with
+    /// each
+    pub sheep: IdMap<SheepId, Vec<TagId>>,
 
-    /// The items present in the simulation
-    pub items: HashMap<ItemId, Vec<usize>>,
+    /// The items present in the simulation and the tags associated with
+    /// each
+    pub items: IdMap<ItemId, Vec<TagId>>,
 
     /// The tag groups present in the simulation
-    pub tag_groups: Vec<HashSet<TagId>>,
+    pub tag_groups: Vec<Vec<TagId>>,
 
     /// The orphaned tags present in the simulation
-    pub tag_orphans: HashSet<TagId>,
+    pub tag_orphans: IdSet<TagId>,
 
     /// IDs of the shepherds present in the simulation
     pub shepherd_ids: Vec<ShepherdId>,
@@ -202,6 +213,7 @@ impl<'a, 'de> Simulation<'a, 'de> {
                 simulation.settings.initial_n_tags_bounds.0
                     ..=simulation.settings.initial_n_tags_bounds.1,
             )));
+        simulation.tag_pool.clone_from(&simulation.tags);
 
         simulation.graph.add_new_tag_groups(
             &mut *rng,
@@ -212,31 +224,37 @@ impl<'a, 'de> Simulation<'a, 'de> {
             simulation.tags.iter().copied(),
         )?;
 
-        simulation.sheep.extend(simulation.graph.create_nodes(
-            rng.gen_range(
-                simulation.settings.initial_n_sheep_bounds.0
-                    ..=simulation.settings.initial_n_sheep_bounds.1,
-            ),
-        ));
+        simulation.sheep.extend(
+            simulation
+                .graph
+                .create_nodes(rng.gen_range(
+                    simulation.settings.initial_n_sheep_bounds.0
+                        ..=simulation.settings.initial_n_sheep_bounds.1,
+                ))
+                .map(|id| (id, Vec::new())),
+        );
         simulation.graph.connect_extremities(
             &mut *rng,
-            simulation.sheep.iter().copied(),
-            simulation.tags.iter().copied(),
+            simulation.sheep.iter_mut(),
+            &mut simulation.tag_pool,
             simulation.settings.n_sheep_tags_bounds.0
                 ..=simulation.settings.n_sheep_tags_bounds.1,
             false,
         );
 
-        simulation.items.extend(simulation.graph.create_nodes(
-            rng.gen_range(
-                simulation.settings.initial_n_items_bounds.0
-                    ..=simulation.settings.initial_n_items_bounds.1,
-            ),
-        ));
+        simulation.items.extend(
+            simulation
+                .graph
+                .create_nodes(rng.gen_range(
+                    simulation.settings.initial_n_items_bounds.0
+                        ..=simulation.settings.initial_n_items_bounds.1,
+                ))
+                .map(|id| (id, Vec::new())),
+        );
         simulation.graph.connect_extremities(
             &mut *rng,
-            simulation.items.iter().copied(),
-            simulation.tags.iter().copied(),
+            simulation.items.iter_mut(),
+            &mut simulation.tag_pool,
             simulation.settings.n_item_tags_bounds.0
                 ..=simulation.settings.n_item_tags_bounds.1,
             true,
@@ -246,19 +264,8 @@ impl<'a, 'de> Simulation<'a, 'de> {
             tags: simulation.tags.clone(),
             items: simulation
                 .items
-                .clone()
-                .into_iter()
-                .map(|id| {
-                    (
-                        id,
-                        simulation
-                            .graph
-                            .0
-                            .neighbors_undirected(id.0.into())
-                            .map(|id| GraphId::new(id.index()))
-                            .collect(),
-                    )
-                })
+                .iter()
+                .map(|(&id, tags)| (id, tags.clone()))
                 .collect(),
         };
 
@@ -269,12 +276,12 @@ impl<'a, 'de> Simulation<'a, 'de> {
         let introduction_epoch = SimulationEvent::BeginEpoch {
             id: simulation.current_epoch,
             data: introduction_epoch,
-        };
+        }
+        .to_json();
+        let introductions = simulation.serialize_introductions();
         for (shepherd, _) in &mut simulation.shepherds {
-            shepherd.write_event(&introduction_epoch);
-            for sheep in simulation.sheep.iter().copied() {
-                shepherd.introduce_to(&simulation.graph, sheep);
-            }
+            shepherd.write_serialized_event(&introduction_epoch);
+            shepherd.write_serialized_event(&introductions);
         }
 
         Ok(simulation)
@@ -284,11 +291,20 @@ impl<'a, 'de> Simulation<'a, 'de> {
         &mut self,
         rng: &mut (impl Rng + ?Sized),
     ) -> Result<(), PoissonError> {
+        // the plain settings are copied out once up front, leaving the hooks
+        // free to be borrowed mutably later on
+        let Settings {
+            n_tags_bounds,
+            n_items_bounds,
+            n_item_tags_bounds,
+            average_tags_per_group,
+            orphaned_tag_threshold,
+            ..
+        } = self.settings;
+
         let new_tags = self
             .graph
-            .create_nodes(rng.gen_range(
-                self.settings.n_tags_bounds.0..=self.settings.n_tags_bounds.1,
-            ))
+            .create_nodes(rng.gen_range(n_tags_bounds.0..=n_tags_bounds.1))
             .collect::<Vec<_>>();
         self.graph.add_to_tag_groups(
             &mut *rng,
@@ -297,58 +313,49 @@ impl<'a, 'de> Simulation<'a, 'de> {
             new_tags.iter().copied(),
         )?;
         self.tags.extend(new_tags.iter());
+        self.tag_pool.extend(new_tags.iter());
 
-        if self.tag_orphans.len() >= self.settings.orphaned_tag_threshold {
-            let orphans = self.tag_orphans.clone();
-            self.tag_orphans.clear();
+        if self.tag_orphans.len() >= orphaned_tag_threshold {
+            let orphans = mem::take(&mut self.tag_orphans);
             self.graph.add_new_tag_groups(
                 &mut *rng,
                 &mut self.tag_groups,
                 &mut self.tag_orphans,
-                orphans.len() / self.settings.average_tags_per_group,
+                orphans.len() / average_tags_per_group,
                 orphans,
             )?;
         }
 
-        let new_items = self
+        let mut new_items = self
             .graph
-            .create_nodes(rng.gen_range(
-                self.settings.n_items_bounds.0
-                    ..=self.settings.n_items_bounds.1,
-            ))
+            .create_nodes(rng.gen_range(n_items_bounds.0..=n_items_bounds.1))
+            .map(|id| (id, Vec::new()))
             .collect::<Vec<_>>();
         self.graph.connect_extremities(
             &mut *rng,
-            new_items.iter().copied(),
-            self.tags.iter().copied(),
-            self.settings.n_item_tags_bounds.0
-                ..=self.settings.n_item_tags_bounds.1,
+            new_items.iter_mut().map(|(id, tags)| (&*id, tags)),
+            &mut self.tag_pool,
+            n_item_tags_bounds.0..=n_item_tags_bounds.1,
             true,
         );
-        self.items.extend(new_items.iter());
 
         self.current_epoch.0 += 1;
         let current_epoch = Epoch {
             tags: new_tags,
-            items: new_items
-                .into_iter()
-                .map(|id| {
-                    (
-                        id,
-                        self.graph
-                            .0
-                            .neighbors_undirected(id.0.into())
-                            .map(|id| GraphId::new(id.index()))
-                            .collect(),
-                    )
-                })
-                .collect(),
+            items: new_items,
         };
 
         if let Some(hook) = &mut self.settings.new_epoch_hook {
             hook(self.current_epoch, &current_epoch);
         }
 
+        self.items.extend(current_epoch.items.iter().cloned());
+        let current_epoch = SimulationEvent::BeginEpoch {
+            id: self.current_epoch,
+            data: current_epoch,
+        }
+        .to_json();
+
         info!(
             n_tags = self.tags.len(),
             n_orphans = self.tag_orphans.len(),
@@ -363,53 +370,121 @@ impl<'a, 'de> Simulation<'a, 'de> {
         // TODO: alter sheep preferences here by some minute amount
         // TODO: add new sheep here
 
-        let current_epoch = SimulationEvent::BeginEpoch {
-            id: self.current_epoch,
-            data: current_epoch,
-        };
-        for (id, (shepherd, sheep_seen)) in self
+        let introductions = self.serialize_introductions();
+
+        // the graph doesn't change for the rest of the epoch, so every feed
+        // can be processed against the same snapshot. each feed is rated
+        // with its own random number generator, seeded here before any work
+        // is handed out, so the ratings don't depend on how the shepherds'
+        // threads are scheduled
+        let adjacency = self.graph.adjacency();
+        let seeds = self
             .shepherds
-            .iter_mut()
+            .iter()
+            .map(|_| {
+                self.sheep
+                    .keys()
+                    .map(|&sheep| (sheep, rng.gen::<u64>()))
+                    .collect::<Vec<_>>()
+            })
+            .collect::<Vec<_>>();
+
+        // every shepherd is a separate process, so each one is driven from
+        // its own thread. within a shepherd, each sheep's feed is built,
+        // rated, and responded to before the next feed is requested, so a
+        // shepherd always has the responses to every earlier feed when
+        // building the next one
+        let shepherd_feeds = thread::scope(|scope| {
+            self.shepherds
+                .iter_mut()
+                .zip(seeds)
+                .map(|((shepherd, sheep_seen), seeds)| {
+                    let (current_epoch, introductions, adjacency) =
+                        (&current_epoch, &introductions, &adjacency);
+                    scope.spawn(move || {
+                        shepherd.write_serialized_event(current_epoch);
+                        shepherd.write_serialized_event(introductions);
+
+                        // we don't merge the writes above into the loop below
+                        // as we want to make sure the shepherd has the full
+                        // picture prior to building feeds
+
+                        let mut paths = adjacency.path_finder();
+                        seeds
+                            .into_iter()
+                            .map(|(sheep, seed)| {
+                                let feed = shepherd.build_feed(sheep);
+                                sheep_seen
+                                    .entry(sheep)
+                                    .or_default()
+                                    .extend(feed.0.iter().copied());
+
+                                let responses = sheep::process_feed(
+                                    &mut StdRng::seed_from_u64(seed),
+                                    &mut paths,
+                                    sheep,
+                                    &feed,
+                                );
+                                shepherd.incorporate_responses(
+                                    sheep,
+                                    responses.clone(),
+                                );
+
+                                (sheep, feed, responses)
+                            })
+                            .collect::<Vec<_>>()
+                    })
+                })
+                .collect::<Vec<_>>()
+                .into_iter()
+                .map(|handle| {
+                    handle.join().expect("A shepherd's thread panicked")
+                })
+                .collect::<Vec<_>>()
+        });
+
+        // the hooks aren't required to be thread safe, so they are called
+        // from this thread once every shepherd is done, in the same order
+        // as the feeds were built and rated
+        for (id, feeds) in shepherd_feeds
+            .into_iter()
             .enumerate()
             .map(|(id, data)| (ShepherdId(id), data))
         {
-            shepherd.write_event(&current_epoch);
-            for sheep in self.sheep.iter().copied() {
-                shepherd.introduce_to(&self.graph, sheep);
-            }
-
-            // we don't merge the loop above into the one below as we want to
-            // make sure the shepherd has the full picture prior to building
-            // feeds
-
-            for sheep in self.sheep.iter().copied() {
-                let feed = shepherd.build_feed(sheep);
-
+            for (sheep, feed, responses) in feeds {
                 if let Some(hook) = &mut self.settings.feed_generation_hook {
                     hook(id, sheep, &feed);
                 }
 
-                if let Some(seen) = sheep_seen.get_mut(&sheep) {
-                    seen.extend(feed.0.iter().copied());
-                } else {
-                    sheep_seen
-                        .insert(sheep, feed.0.iter().copied().collect());
-                }
-
-                let responses =
-                    sheep::process_feed(&mut *rng, &self.graph, sheep, feed);
-
                 if let Some(hook) = &mut self.settings.feed_rated_hook {
                     hook(id, sheep, &responses);
                 }
-
-                shepherd.incorporate_responses(sheep, responses);
             }
         }
 
         Ok(())
     }
 
+    /// Serialize an introduction to every sheep in the simulation
+    ///
+    /// Every [`Shepherd`] is introduced to the same sheep at the start of an
+    /// epoch, so the introductions are serialized once and the same bytes
+    /// are written to each of them
+    fn serialize_introductions(&self) -> Vec<u8> {
+        let mut introductions = Vec::new();
+        for (&sheep, tags) in &self.sheep {
+            introductions.extend(
+                SimulationEvent::SheepIntroduction {
+                    sheep,
+                    associated_tags: tags.clone(),
+                }
+                .to_json(),
+            );
+        }
+
+        introductions
+    }
+
     /// Stop the simulation, terminating all [`Shepherd`]s and return the
     /// simulation graph with associated metadata
     pub fn stop(self) -> anyhow::Result<SimulationParts<'a>> {
@@ -423,6 +498,7 @@ impl<'a, 'de> Simulation<'a, 'de> {
             tag_groups,
             tag_orphans,
             shepherds,
+            ..
         } = self;
         let mut shepherd_ids = Vec::with_capacity(shepherds.len());
 